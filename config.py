@@ -1,6 +1,7 @@
 """
 Configuraciones y constantes para la aplicación Minecraft World Sync.
 """
+import functools
 import os
 import platform
 from pathlib import Path
@@ -9,6 +10,7 @@ from pathlib import Path
 ONEDRIVE_ROOT = Path(".")  # Esto se configurará dinámicamente
 APP_DIR = ONEDRIVE_ROOT / "app"
 WORLD_SYNC_DIR = ONEDRIVE_ROOT / "world_sync"
+WORLD_SYNC_DIR_STR = str(WORLD_SYNC_DIR)  # Para os.path.join en bucles
 MODS_DIR = ONEDRIVE_ROOT / "mods"
 
 # Archivos de metadatos
@@ -16,6 +18,7 @@ MUNDOS_JSON = WORLD_SYNC_DIR / "mundos.json"
 MODS_JSON = MODS_DIR / "mods.json"
 
 # Ruta a la carpeta .minecraft (varía según sistema operativo)
+@functools.lru_cache(maxsize=1)
 def get_minecraft_dir():
     """Obtiene la ruta a la carpeta .minecraft según el sistema operativo."""
     if platform.system() == "Windows":
@@ -27,6 +30,7 @@ def get_minecraft_dir():
 
 MINECRAFT_DIR = get_minecraft_dir()
 MINECRAFT_SAVES_DIR = MINECRAFT_DIR / "saves"
+MINECRAFT_SAVES_DIR_STR = str(MINECRAFT_SAVES_DIR)
 MINECRAFT_MODS_DIR = MINECRAFT_DIR / "mods"
 
 # Configuración de la aplicación
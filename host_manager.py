@@ -2,15 +2,20 @@
 Gestor de mundos para la aplicación Minecraft World Sync.
 Maneja la sincronización bidireccional de mundos entre computadoras.
 """
+import errno
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import config
 from utils import (
     get_computer_id, get_computer_display_name, ensure_dir_exists, 
-    load_json, save_json, copy_directory, get_timestamp, compare_timestamps,
-    compare_directories
+    load_json, save_json_atomic, write_bytes_atomic, copy_directory,
+    get_timestamp, get_timestamp_ns, same_timestamp, compare_timestamps,
+    compare_directories, compare_manifests, build_manifest, hash_manifest,
+    pack_world, unpack_world
 )
 
 class HostManager:
@@ -21,31 +26,164 @@ class HostManager:
         self.computer_id = get_computer_id()
         self.computer_display_name = get_computer_display_name()
         
-        # Asegurar que existan las carpetas necesarias
-        ensure_dir_exists(config.WORLD_SYNC_DIR)
+        # Asegurar que existan las carpetas necesarias (crea también WORLD_SYNC_DIR)
         self.computer_dir = config.WORLD_SYNC_DIR / self.computer_id
         ensure_dir_exists(self.computer_dir)
         
+        # Control.json de las demás PC, cargados la primera vez que se necesitan
+        self._peer_control_cache = None
+        
         # Cargar lista de mundos
-        self.mundos = load_json(config.MUNDOS_JSON, {"mundos": {}})
+        self.mundos = None
+        self._mundos_mtime = None
+        self._refresh_mundos()
         
         # Verificar si la carpeta de guardados de Minecraft existe
-        if not os.path.exists(config.MINECRAFT_SAVES_DIR):
+        if not config.MINECRAFT_SAVES_DIR.is_dir():
             raise FileNotFoundError(f"No se encontró la carpeta de guardados de Minecraft en {config.MINECRAFT_SAVES_DIR}")
     
+    def _refresh_mundos(self):
+        """
+        Vuelve a leer mundos.json solo si cambió en disco desde la última vez
+        (por ejemplo, porque OneDrive trajo la subida de otra PC).
+        """
+        try:
+            mtime = os.stat(config.MUNDOS_JSON).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self.mundos is not None and mtime == self._mundos_mtime:
+            return
+        
+        self.mundos = load_json(config.MUNDOS_JSON, {"mundos": {}})
+        self._worlds = self.mundos.setdefault("mundos", {})
+        self._mundos_mtime = mtime
+        self._peer_control_cache = None
+    
+    def _save_mundos(self):
+        """Guarda mundos.json y recuerda su fecha para no volver a leerlo."""
+        save_json_atomic(config.MUNDOS_JSON, self.mundos)
+        self._mundos_mtime = os.stat(config.MUNDOS_JSON).st_mtime_ns
+    
+    def _load_manifest(self, manifest_path):
+        """
+        Carga el manifiesto guardado de una copia sincronizada.
+        Retorna None si no existe, para que se calcule a partir de la copia.
+        """
+        if not manifest_path.exists():
+            return None
+        return load_json(manifest_path)
+    
+    def _read_base_commit_index(self, pc_dir):
+        """
+        Lee el índice base_commits.idx de una PC: {mundo: (base_commit, commit_id)}.
+        Retorna un diccionario vacío si la PC todavía no tiene índice. En los
+        índices antiguos, sin commit_id, este queda en None.
+        """
+        index = {}
+        try:
+            with open(os.path.join(pc_dir, "base_commits.idx"), 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return index
+        
+        for line in lines:
+            fields = line.split("\t")
+            if len(fields) >= 2:
+                commit_id = fields[2] if len(fields) > 2 else ""
+                index[fields[0]] = (fields[1] or None, commit_id or None)
+        return index
+    
+    def _update_base_commit_index(self, world_name, base_commit, commit_id):
+        """Registra el commit base y el commit actual de un mundo en el índice de esta PC."""
+        index = self._read_base_commit_index(self.computer_dir)
+        index[world_name] = (base_commit, commit_id)
+        content = "".join(f"{name}\t{base or ''}\t{commit or ''}\n"
+                          for name, (base, commit) in index.items())
+        write_bytes_atomic(self.computer_dir / "base_commits.idx", content.encode('utf-8'))
+    
+    def _probe_peer(self, pc_id, pc_dir, own_index):
+        """
+        Lee los control.json de los mundos de otra PC.
+        Retorna (pc_id, {mundo: datos}). Se omiten los mundos cuyo índice indica
+        que están basados en otro commit que el nuestro (no puede haber conflicto),
+        pero solo si el índice está al día: OneDrive puede traer el índice y el
+        control.json por separado, así que el commit del índice debe ser el que
+        figura en mundos.json; si no, se lee el control.json.
+        """
+        index = self._read_base_commit_index(pc_dir)
+        controls = {}
+        with os.scandir(pc_dir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                world_name = entry.name
+                if world_name in index and world_name in own_index:
+                    base_commit, commit_id = index[world_name]
+                    latest_commit = self._worlds.get(world_name, {}).get("commit_id")
+                    if (base_commit != own_index[world_name][0] and
+                            commit_id is not None and commit_id == latest_commit):
+                        continue
+                
+                pc_control_path = os.path.join(entry.path, "control.json")
+                if os.path.exists(pc_control_path):
+                    controls[world_name] = load_json(pc_control_path)
+        return pc_id, controls
+    
+    def _load_peer_cache(self):
+        """
+        Carga en memoria los control.json de las demás PC en una sola pasada:
+        {pc_id: {mundo: datos}}. Se invalida al subir, descargar o resolver conflictos.
+        """
+        own_index = self._read_base_commit_index(self.computer_dir)
+        peers = []
+        with os.scandir(config.WORLD_SYNC_DIR_STR) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue  # Saltamos archivos como mundos.json
+                if entry.name == self.computer_id:
+                    continue  # Saltamos nuestra propia PC
+                peers.append((entry.name, entry.path, own_index))
+        
+        # Leer las carpetas de las demás PC en paralelo: en OneDrive
+        # cada acceso a disco tiene una latencia alta
+        self._peer_control_cache = {}
+        if peers:
+            with ThreadPoolExecutor(max_workers=min(16, len(peers))) as executor:
+                self._peer_control_cache = dict(executor.map(self._probe_peer, *zip(*peers)))
+        return self._peer_control_cache
+    
+    def _compare_with_synced(self, local_world_path, world_sync_dir):
+        """
+        Compara un mundo local con la versión sincronizada en world_sync_dir
+        (la carpeta de un mundo dentro de la carpeta de una PC).
+        Usa el manifiesto de esa versión; para versiones antiguas, sin manifiesto,
+        compara con la carpeta minecraft_saves_data. Retorna None si no hay con qué comparar.
+        """
+        manifest = self._load_manifest(Path(world_sync_dir) / "manifest.json")
+        if manifest is not None:
+            return compare_manifests(build_manifest(local_world_path), manifest)
+        
+        legacy_sync_path = os.path.join(world_sync_dir, "minecraft_saves_data")
+        if os.path.isdir(legacy_sync_path):
+            return compare_directories(local_world_path, legacy_sync_path)
+        return None
+    
     def get_available_worlds(self):
         """Obtiene la lista de mundos disponibles en el sistema de sincronización."""
-        return list(self.mundos.get("mundos", {}).keys())
+        self._refresh_mundos()
+        return list(self._worlds.keys())
     
     def get_local_worlds(self):
         """Obtiene la lista de mundos locales en la carpeta de Minecraft."""
-        return [d.name for d in os.scandir(config.MINECRAFT_SAVES_DIR) if d.is_dir()]
+        with os.scandir(config.MINECRAFT_SAVES_DIR_STR) as it:
+            return [d.name for d in it if d.is_dir()]
     
-    def check_world_status(self, world_name):
+    def peek_world_status(self, world_name):
         """
-        Verifica el estado de un mundo.
-        Retorna un diccionario con información sobre si el mundo está sincronizado,
-        si hay una versión más reciente, etc.
+        Verifica el estado de un mundo sin comparar archivos ni buscar conflictos:
+        solo consulta mundos.json y el control.json de esta PC.
+        Retorna el mismo diccionario que check_world_status, con
+        has_local_changes en False y sin conflictos.
         """
         result = {
             "exists_locally": False,
@@ -58,56 +196,50 @@ class HostManager:
         }
         
         # Verificar si el mundo existe localmente
-        local_world_path = config.MINECRAFT_SAVES_DIR / world_name
-        result["exists_locally"] = local_world_path.exists()
+        result["exists_locally"] = (config.MINECRAFT_SAVES_DIR / world_name).exists()
+        
+        # Verificar si existe control.json para este mundo en la computadora actual
+        local_control_path = self.computer_dir / world_name / "control.json"
+        if local_control_path.exists():
+            result["local_version_info"] = load_json(local_control_path)
         
         # Verificar si el mundo existe en el sistema de sincronización
-        if world_name in self.mundos.get("mundos", {}):
+        self._refresh_mundos()
+        if world_name in self._worlds:
             result["exists_in_sync"] = True
             
             # Obtener información de la última versión
-            latest_info = self.mundos["mundos"][world_name]
+            latest_info = self._worlds[world_name]
             result["latest_version_info"] = latest_info
             
-            # Verificar si existe control.json para este mundo en la computadora actual
-            local_control_path = self.computer_dir / world_name / "control.json"
-            if local_control_path.exists():
-                local_control = load_json(local_control_path)
-                result["local_version_info"] = local_control
-                
-                # Comparar versiones basadas en timestamp
-                if local_control.get("timestamp") == latest_info.get("timestamp"):
-                    result["has_latest_version"] = True
-                    
-                    # Incluso si tenemos la última versión, verificar si hay cambios locales
-                    if result["exists_locally"]:
-                        # Comparar los archivos locales con la copia sincronizada
-                        local_sync_path = self.computer_dir / world_name / "minecraft_saves_data"
-                        
-                        if local_sync_path.exists():
-                            dir_comparison = compare_directories(local_world_path, local_sync_path)
-                            result["has_local_changes"] = not dir_comparison["identical"]
-                            
-                            # Añadir información de cambios a los detalles
-                            if not dir_comparison["identical"]:
-                                result["local_changes_details"] = dir_comparison["differences"]
-                                result["has_important_changes"] = dir_comparison["has_important_changes"]
-                
-                elif local_control.get("base_commit") != latest_info.get("commit_id"):
-                    # Posible conflicto: versiones basadas en diferentes commits
-                    result["conflicts"].append({
-                        "type": "base_commit_mismatch",
-                        "message": "La versión local está basada en un commit diferente al de la última versión"
-                    })
-            
-            # Aún si no tenemos metadatos locales, si el mundo existe localmente, verificar cambios
-            elif result["exists_locally"]:
-                # Buscar el mundo en otros dispositivos para comparar
-                latest_pc_id = latest_info.get("pc_id")
-                if latest_pc_id:
-                    latest_sync_path = config.WORLD_SYNC_DIR / latest_pc_id / world_name / "minecraft_saves_data"
-                    if latest_sync_path.exists():
-                        dir_comparison = compare_directories(local_world_path, latest_sync_path)
+            # Comparar versiones basadas en timestamp
+            local_control = result["local_version_info"]
+            if local_control and same_timestamp(local_control, latest_info):
+                result["has_latest_version"] = True
+        
+        return result
+    
+    def check_world_status(self, world_name):
+        """
+        Verifica el estado de un mundo.
+        Retorna un diccionario con información sobre si el mundo está sincronizado,
+        si hay una versión más reciente, etc.
+        """
+        result = self.peek_world_status(world_name)
+        if not result["exists_in_sync"]:
+            return result
+        
+        local_world_path = config.MINECRAFT_SAVES_DIR / world_name
+        latest_info = result["latest_version_info"]
+        local_control = result["local_version_info"]
+        
+        if local_control:
+            if result["has_latest_version"]:
+                # Incluso si tenemos la última versión, verificar si hay cambios locales
+                if result["exists_locally"]:
+                    # Comparar los archivos locales con lo que se sincronizó
+                    dir_comparison = self._compare_with_synced(local_world_path, self.computer_dir / world_name)
+                    if dir_comparison is not None:
                         result["has_local_changes"] = not dir_comparison["identical"]
                         
                         # Añadir información de cambios a los detalles
@@ -115,38 +247,55 @@ class HostManager:
                             result["local_changes_details"] = dir_comparison["differences"]
                             result["has_important_changes"] = dir_comparison["has_important_changes"]
             
-            # Detectar conflictos potenciales (commits paralelos)
-            for pc_id in os.listdir(config.WORLD_SYNC_DIR):
-                if pc_id == self.computer_id:
-                    continue  # Saltamos nuestra propia PC
-                
-                pc_control_path = config.WORLD_SYNC_DIR / pc_id / world_name / "control.json"
-                if pc_control_path.exists():
-                    pc_control = load_json(pc_control_path)
-                    
-                    # Obtener nombre de la computadora si está disponible
-                    pc_name = pc_control.get("pc_name", pc_id)
+            elif local_control.get("base_commit") != latest_info.get("commit_id"):
+                # Posible conflicto: versiones basadas en diferentes commits
+                result["conflicts"].append({
+                    "type": "base_commit_mismatch",
+                    "message": "La versión local está basada en un commit diferente al de la última versión"
+                })
+        
+        # Aún si no tenemos metadatos locales, si el mundo existe localmente, verificar cambios
+        elif result["exists_locally"]:
+            # Buscar el mundo en otros dispositivos para comparar
+            latest_pc_id = latest_info.get("pc_id")
+            if latest_pc_id:
+                latest_world_dir = os.path.join(config.WORLD_SYNC_DIR_STR, latest_pc_id, world_name)
+                dir_comparison = self._compare_with_synced(local_world_path, latest_world_dir)
+                if dir_comparison is not None:
+                    result["has_local_changes"] = not dir_comparison["identical"]
                     
-                    # Si hay dos PC con el mismo base_commit pero diferente commit_id,
-                    # podría haber un conflicto de versiones paralelas
-                    if result["local_version_info"] and (
-                        pc_control.get("base_commit") == result["local_version_info"].get("base_commit") and
-                        pc_control.get("commit_id") != result["local_version_info"].get("commit_id") and
-                        pc_control.get("timestamp") != result["local_version_info"].get("timestamp")):
-                        result["conflicts"].append({
-                            "type": "parallel_commits",
-                            "message": f"La PC '{pc_name}' tiene una versión diferente basada en el mismo commit base",
-                            "pc_id": pc_id,
-                            "pc_name": pc_name,
-                            "pc_info": pc_control
-                        })
-        else:
-            # Aunque no exista en el sistema, verificar si hay copias de seguridad locales
-            # que puedan tener la misma estructura
-            local_backup_path = self.computer_dir / world_name
-            if local_backup_path.exists() and (local_backup_path / "control.json").exists():
-                local_control = load_json(local_backup_path / "control.json")
-                result["local_version_info"] = local_control
+                    # Añadir información de cambios a los detalles
+                    if not dir_comparison["identical"]:
+                        result["local_changes_details"] = dir_comparison["differences"]
+                        result["has_important_changes"] = dir_comparison["has_important_changes"]
+        
+        # Detectar conflictos potenciales (commits paralelos).
+        # Sin control.json local no hay commit base con el cual comparar.
+        if local_control:
+            peer_cache = self._peer_control_cache
+            if peer_cache is None:
+                peer_cache = self._load_peer_cache()
+            
+            for pc_id, pc_controls in peer_cache.items():
+                pc_control = pc_controls.get(world_name)
+                if pc_control is None:
+                    continue
+                
+                # Obtener nombre de la computadora si está disponible
+                pc_name = pc_control.get("pc_name", pc_id)
+                
+                # Si hay dos PC con el mismo base_commit pero diferente commit_id,
+                # podría haber un conflicto de versiones paralelas
+                if (pc_control.get("base_commit") == local_control.get("base_commit") and
+                    pc_control.get("commit_id") != local_control.get("commit_id") and
+                    not same_timestamp(pc_control, local_control)):
+                    result["conflicts"].append({
+                        "type": "parallel_commits",
+                        "message": f"La PC '{pc_name}' tiene una versión diferente basada en el mismo commit base",
+                        "pc_id": pc_id,
+                        "pc_name": pc_name,
+                        "pc_info": pc_control
+                    })
         
         return result
     
@@ -155,46 +304,63 @@ class HostManager:
         Descarga la última versión de un mundo desde el sistema de sincronización.
         Retorna True si todo salió bien, False en caso de error.
         """
-        if world_name not in self.mundos.get("mundos", {}):
+        self._refresh_mundos()
+        if world_name not in self._worlds:
             return False, "El mundo no existe en el sistema de sincronización"
         
         # Obtener información de la última versión
-        latest_info = self.mundos["mundos"][world_name]
+        latest_info = self._worlds[world_name]
         latest_pc_id = latest_info.get("pc_id")
         
-        # Ruta a los datos del mundo en el sistema de sincronización
-        source_path = config.WORLD_SYNC_DIR / latest_pc_id / world_name / "minecraft_saves_data"
-        if not source_path.exists():
-            return False, f"No se encontraron los datos del mundo en {source_path}"
+        # Ruta a los datos del mundo en el sistema de sincronización: un único
+        # archivo empaquetado o, en versiones antiguas, la carpeta completa
+        source_dir = config.WORLD_SYNC_DIR / latest_pc_id / world_name
+        source_archive = source_dir / "minecraft_saves_data.tar.gz"
+        source_path = source_dir / "minecraft_saves_data"
+        if not source_archive.exists() and not source_path.exists():
+            return False, f"No se encontraron los datos del mundo en {source_dir}"
         
         # Ruta local donde se guardarán los datos
         local_world_path = config.MINECRAFT_SAVES_DIR / world_name
         
-        # Verificar si hay cambios locales que no se han sincronizado
-        if local_world_path.exists():
-            local_sync_path = self.computer_dir / world_name / "minecraft_saves_data"
-            if local_sync_path.exists():
-                dir_comparison = compare_directories(local_world_path, local_sync_path)
-                if not dir_comparison["identical"]:
-                    backup_path = config.MINECRAFT_SAVES_DIR / f"{world_name}_backup_{get_timestamp().replace(':', '-').replace(' ', '_')}"
-                    shutil.copytree(local_world_path, backup_path)
-        
-        # Crear copia de seguridad si el mundo ya existe localmente
-        if local_world_path.exists():
-            backup_path = config.MINECRAFT_SAVES_DIR / f"{world_name}_backup_{get_timestamp().replace(':', '-').replace(' ', '_')}"
-            shutil.copytree(local_world_path, backup_path)
+        # Crear copia de seguridad si el mundo ya existe localmente. Basta con
+        # renombrar la carpeta: es instantáneo y deja libre la ruta original.
+        backup_base = os.path.join(config.MINECRAFT_SAVES_DIR_STR,
+                                   f"{world_name}_backup_{time.strftime('%Y-%m-%d_%H-%M-%S')}")
+        # Si ya hay una copia con el mismo nombre (dos descargas en el mismo
+        # segundo) se agrega un contador para no mezclarlas
+        backup_path = backup_base
+        counter = 1
+        while os.path.lexists(backup_path):
+            backup_path = f"{backup_base}_{counter}"
+            counter += 1
+        try:
+            os.rename(local_world_path, backup_path)
+        except FileNotFoundError:
+            pass  # No hay mundo local que respaldar
+        except OSError as e:
+            # Solo se puede mover copiando si la carpeta está en otra unidad
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(local_world_path), backup_path)
         
         # Copiar datos del mundo a la carpeta local
-        if local_world_path.exists():
-            shutil.rmtree(local_world_path)
-        shutil.copytree(source_path, local_world_path)
+        if source_archive.exists():
+            unpack_world(source_archive, local_world_path)
+        else:
+            copy_directory(source_path, local_world_path)
         
-        # Copiar datos a nuestra carpeta de sincronización
-        local_sync_path = self.computer_dir / world_name / "minecraft_saves_data"
-        if local_sync_path.exists():
-            shutil.rmtree(local_sync_path)
-        ensure_dir_exists(local_sync_path.parent)
-        shutil.copytree(source_path, local_sync_path)
+        # Guardar los datos en nuestra carpeta de sincronización (para que otras
+        # PC puedan descargarlos si se elige nuestra versión)
+        world_sync_dir = self.computer_dir / world_name
+        world_sync_dir.mkdir(parents=True, exist_ok=True)
+        local_archive = world_sync_dir / "minecraft_saves_data.tar.gz"
+        if not source_archive.exists():
+            pack_world(local_world_path, local_archive)
+        elif latest_pc_id != self.computer_id:
+            shutil.copy2(source_archive, local_archive)
+        shutil.rmtree(world_sync_dir / "minecraft_saves_data", ignore_errors=True)
+        save_json_atomic(world_sync_dir / "manifest.json", build_manifest(local_world_path))
         
         # Actualizar control.json local con la información más reciente
         local_control = {
@@ -202,10 +368,15 @@ class HostManager:
             "base_commit": latest_info.get("commit_id"),
             "comment": "Descargado de la última versión",
             "timestamp": get_timestamp(),
+            "timestamp_ns": get_timestamp_ns(),
             "original_timestamp": latest_info.get("timestamp"),
+            "original_timestamp_ns": latest_info.get("timestamp_ns"),
             "pc_name": self.computer_display_name
         }
-        save_json(self.computer_dir / world_name / "control.json", local_control)
+        save_json_atomic(self.computer_dir / world_name / "control.json", local_control)
+        self._update_base_commit_index(world_name, local_control["base_commit"],
+                                       local_control["commit_id"])
+        self._peer_control_cache = None
         
         return True, "Mundo descargado correctamente"
     
@@ -219,14 +390,17 @@ class HostManager:
         if not local_world_path.exists():
             return False, "El mundo no existe localmente"
         
-        # Generar un nuevo ID de commit
-        import uuid
-        new_commit_id = uuid.uuid4().hex[:12]
+        # El ID de commit se deriva del contenido del mundo: el mismo estado
+        # siempre produce el mismo ID
+        world_manifest = build_manifest(local_world_path)
+        new_commit_id = hash_manifest(world_manifest)
         
         # Determinar el commit base
-        base_commit = None
-        if world_name in self.mundos.get("mundos", {}):
-            base_commit = self.mundos["mundos"][world_name].get("commit_id")
+        self._refresh_mundos()
+        latest_commit = None
+        if world_name in self._worlds:
+            latest_commit = self._worlds[world_name].get("commit_id")
+        base_commit = latest_commit
         
         # Si no hay control.json para este mundo, crearlo
         local_control_path = self.computer_dir / world_name / "control.json"
@@ -234,38 +408,45 @@ class HostManager:
             local_control = load_json(local_control_path)
             base_commit = local_control.get("commit_id") or base_commit
         
+        # La última versión subida ya es exactamente este mundo
+        if new_commit_id == latest_commit:
+            return True, "No hay cambios que subir"
+        
         # Preparar nueva información de control
         timestamp = get_timestamp()
+        timestamp_ns = get_timestamp_ns()
         control_info = {
             "commit_id": new_commit_id,
             "base_commit": base_commit,
             "comment": comment or "Actualización",
             "timestamp": timestamp,
+            "timestamp_ns": timestamp_ns,
             "pc_name": self.computer_display_name
         }
         
-        # Copiar mundo local a carpeta de sincronización
-        local_sync_path = self.computer_dir / world_name / "minecraft_saves_data"
-        if local_sync_path.exists():
-            shutil.rmtree(local_sync_path)
-        ensure_dir_exists(local_sync_path.parent)
-        shutil.copytree(local_world_path, local_sync_path)
+        # Empaquetar el mundo local en la carpeta de sincronización: OneDrive
+        # sube un solo archivo en vez de miles. La carpeta con el formato
+        # anterior (archivos sueltos) ya no se necesita.
+        world_sync_dir = self.computer_dir / world_name
+        pack_world(local_world_path, world_sync_dir / "minecraft_saves_data.tar.gz")
+        shutil.rmtree(world_sync_dir / "minecraft_saves_data", ignore_errors=True)
         
-        # Guardar control.json
-        save_json(local_control_path, control_info)
+        # Guardar control.json y el manifiesto del mundo empaquetado
+        save_json_atomic(local_control_path, control_info)
+        save_json_atomic(world_sync_dir / "manifest.json", world_manifest)
+        self._update_base_commit_index(world_name, base_commit, new_commit_id)
+        self._peer_control_cache = None
         
         # Actualizar mundos.json con la nueva información
-        if "mundos" not in self.mundos:
-            self.mundos["mundos"] = {}
-        
-        self.mundos["mundos"][world_name] = {
+        self._worlds[world_name] = {
             "commit_id": new_commit_id,
             "pc_id": self.computer_id,
             "pc_name": self.computer_display_name,
             "timestamp": timestamp,
+            "timestamp_ns": timestamp_ns,
             "comment": comment or "Actualización"
         }
-        save_json(config.MUNDOS_JSON, self.mundos)
+        self._save_mundos()
         
         return True, "Mundo subido correctamente"
     
@@ -273,10 +454,11 @@ class HostManager:
         """
         Resuelve un conflicto eligiendo cuál versión mantener.
         """
-        if world_name not in self.mundos.get("mundos", {}):
+        self._refresh_mundos()
+        if world_name not in self._worlds:
             return False, "El mundo no existe en el sistema de sincronización"
         
-        if chosen_pc_id not in os.listdir(config.WORLD_SYNC_DIR):
+        if not (config.WORLD_SYNC_DIR / chosen_pc_id).is_dir():
             return False, f"No se encontró la computadora {chosen_pc_id}"
         
         # Obtener información de la versión elegida
@@ -288,14 +470,16 @@ class HostManager:
         pc_name = chosen_control.get("pc_name", chosen_pc_id)
         
         # Actualizar mundos.json con la información de la versión elegida
-        self.mundos["mundos"][world_name] = {
+        self._worlds[world_name] = {
             "commit_id": chosen_control.get("commit_id"),
             "pc_id": chosen_pc_id,
             "pc_name": pc_name,
             "timestamp": chosen_control.get("timestamp"),
+            "timestamp_ns": chosen_control.get("timestamp_ns"),
             "comment": f"Conflicto resuelto: se eligió la versión de {pc_name}"
         }
-        save_json(config.MUNDOS_JSON, self.mundos)
+        self._save_mundos()
+        self._peer_control_cache = None
         
         # Si la versión elegida no es la nuestra, la descargamos
         if chosen_pc_id != self.computer_id:
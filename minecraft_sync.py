@@ -2,19 +2,36 @@
 Aplicación principal de Minecraft World Sync.
 Proporciona una interfaz gráfica para sincronizar mundos y gestionar mods de Minecraft.
 """
+import functools
+import logging
 import os
 import sys
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox
 from pathlib import Path
 
 import config
 from utils import (
     ensure_dir_exists, get_computer_id, get_computer_name, 
-    save_computer_name, get_computer_display_name
+    save_computer_name, get_computer_display_name,
+    load_json, save_json, get_config_path
 )
-from host_manager import HostManager
-from mod_manager import ModManager
+
+logger = logging.getLogger("mcsync")
+
+# Los estilos de ttk son globales al intérprete de Tk: basta configurarlos una vez
+_STYLES_DONE = False
+
+def _configure_styles():
+    """Configura los estilos de ttk de la aplicación (solo la primera vez)."""
+    global _STYLES_DONE
+    if _STYLES_DONE:
+        return
+    style = ttk.Style()
+    style.configure("TFrame", background=config.BACKGROUND_COLOR)
+    style.configure("TButton", background=config.PRIMARY_COLOR, foreground=config.TEXT_COLOR)
+    style.configure("TLabel", background=config.BACKGROUND_COLOR, foreground=config.TEXT_COLOR)
+    _STYLES_DONE = True
 
 class MinecraftSyncApp:
     """Aplicación principal de Minecraft World Sync."""
@@ -32,7 +49,10 @@ class MinecraftSyncApp:
         # Solicitar nombre de la computadora si es la primera vez
         self.check_computer_name()
         
-        # Inicializar gestores
+        # Inicializar gestores (se importan aquí para no retrasar el arranque
+        # de quien solo importa este módulo)
+        from host_manager import HostManager
+        from mod_manager import ModManager
         try:
             self.host_manager = HostManager()
             self.mod_manager = ModManager()
@@ -56,6 +76,7 @@ class MinecraftSyncApp:
     def check_computer_name(self):
         """Verifica si existe un nombre para la computadora y solicita uno si no."""
         if get_computer_name() is None:
+            from tkinter import simpledialog
             name = simpledialog.askstring(
                 "Nombre del dispositivo", 
                 "Esta es la primera vez que ejecutas Minecraft World Sync.\n"
@@ -76,6 +97,16 @@ class MinecraftSyncApp:
         current_dir = Path(os.path.abspath(os.path.dirname(__file__)))
         parent_dir = current_dir.parent
         
+        # Usar la carpeta detectada en una ejecución anterior, si todavía existe
+        # (salvo que ahora se ejecute desde la carpeta app de otra ubicación)
+        local_config = load_json(get_config_path(), {})
+        cached_root = local_config.get("onedrive_root")
+        if cached_root and (current_dir.name != "app" or parent_dir == Path(cached_root)) \
+                and Path(cached_root).is_dir():
+            config.ONEDRIVE_ROOT = Path(cached_root)
+            self.update_onedrive_paths()
+            return
+        
         # Verificar si estamos en la estructura esperada
         if current_dir.name == "app" and (parent_dir / "world_sync").exists():
             # Estamos en la estructura correcta, usar parent_dir como ONEDRIVE_ROOT
@@ -97,9 +128,16 @@ class MinecraftSyncApp:
             
             config.ONEDRIVE_ROOT = example_path
         
-        # Actualizar las rutas derivadas
+        # Recordar la carpeta para no volver a buscarla en el próximo inicio
+        local_config["onedrive_root"] = str(config.ONEDRIVE_ROOT)
+        save_json(get_config_path(), local_config)
+        self.update_onedrive_paths()
+    
+    def update_onedrive_paths(self):
+        """Actualiza las rutas que dependen de config.ONEDRIVE_ROOT."""
         config.APP_DIR = config.ONEDRIVE_ROOT / "app"
         config.WORLD_SYNC_DIR = config.ONEDRIVE_ROOT / "world_sync"
+        config.WORLD_SYNC_DIR_STR = str(config.WORLD_SYNC_DIR)
         config.MODS_DIR = config.ONEDRIVE_ROOT / "mods"
         config.MUNDOS_JSON = config.WORLD_SYNC_DIR / "mundos.json"
         config.MODS_JSON = config.MODS_DIR / "mods.json"
@@ -107,21 +145,23 @@ class MinecraftSyncApp:
     def create_widgets(self):
         """Crea los widgets de la interfaz gráfica."""
         # Estilo
-        style = ttk.Style()
-        style.configure("TFrame", background=config.BACKGROUND_COLOR)
-        style.configure("TButton", background=config.PRIMARY_COLOR, foreground=config.TEXT_COLOR)
-        style.configure("TLabel", background=config.BACKGROUND_COLOR, foreground=config.TEXT_COLOR)
+        _configure_styles()
         
         # Contenedor principal
         self.main_frame = ttk.Frame(self.root, padding="10")
         self.main_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Crear contenedores para cada pantalla
+        # Crear contenedores para cada pantalla, apilados en la misma celda:
+        # cambiar de pantalla solo trae la elegida al frente
+        self.main_frame.rowconfigure(0, weight=1)
+        self.main_frame.columnconfigure(0, weight=1)
         self.screens = {
             config.SCREEN_MAIN: self.create_main_screen(),
             config.SCREEN_HOST: self.create_host_screen(),
             config.SCREEN_MODS: self.create_mods_screen()
         }
+        for screen in self.screens.values():
+            screen.grid(row=0, column=0, sticky="nsew")
         
         # Barra de estado
         self.status_bar = ttk.Frame(self.root, relief=tk.SUNKEN, padding="2")
@@ -144,12 +184,12 @@ class MinecraftSyncApp:
         
         # Botones de navegación
         host_button = ttk.Button(frame, text="Gestionar Mundos", 
-                                command=lambda: self.show_screen(config.SCREEN_HOST),
+                                command=functools.partial(self.show_screen, config.SCREEN_HOST),
                                 width=30)
         host_button.pack(pady=10)
         
         mods_button = ttk.Button(frame, text="Gestionar Mods", 
-                                command=lambda: self.show_screen(config.SCREEN_MODS),
+                                command=functools.partial(self.show_screen, config.SCREEN_MODS),
                                 width=30)
         mods_button.pack(pady=10)
         
@@ -179,6 +219,8 @@ class MinecraftSyncApp:
         worlds_container.pack(fill=tk.BOTH, expand=True)
         
         self.worlds_listbox = tk.Listbox(worlds_container, height=10)
+        self._world_names = []
+        self._world_is_local = []
         self.worlds_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         worlds_scrollbar = ttk.Scrollbar(worlds_container, orient=tk.VERTICAL, 
@@ -219,7 +261,7 @@ class MinecraftSyncApp:
         
         # Botón para regresar a la pantalla principal
         back_button = ttk.Button(frame, text="Volver al menú principal", 
-                                command=lambda: self.show_screen(config.SCREEN_MAIN))
+                                command=functools.partial(self.show_screen, config.SCREEN_MAIN))
         back_button.pack(pady=(20, 0))
         
         return frame
@@ -245,18 +287,14 @@ class MinecraftSyncApp:
         
         # Botón para regresar a la pantalla principal
         back_button = ttk.Button(frame, text="Volver al menú principal", 
-                                command=lambda: self.show_screen(config.SCREEN_MAIN))
+                                command=functools.partial(self.show_screen, config.SCREEN_MAIN))
         back_button.pack(pady=(20, 0))
         
         return frame
     
     def show_screen(self, screen_name):
         """Muestra la pantalla especificada y oculta las demás."""
-        for name, screen in self.screens.items():
-            if name == screen_name:
-                screen.pack(fill=tk.BOTH, expand=True)
-            else:
-                screen.pack_forget()
+        self.screens[screen_name].tkraise()
         
         # Acciones específicas para cada pantalla
         if screen_name == config.SCREEN_HOST:
@@ -266,16 +304,21 @@ class MinecraftSyncApp:
         """Actualiza la lista de mundos disponibles."""
         self.worlds_listbox.delete(0, tk.END)
         
-        # Obtener mundos sincronizados
+        # Mundos sincronizados, seguidos de los mundos locales que no estén en la
+        # lista. El nombre y si es solo local se guardan en listas paralelas,
+        # indexadas por la fila de la lista, para no extraerlos del texto mostrado.
         sync_worlds = self.host_manager.get_available_worlds()
-        for world in sync_worlds:
-            self.worlds_listbox.insert(tk.END, world)
-        
-        # Obtener mundos locales que no estén en la lista
-        local_worlds = self.host_manager.get_local_worlds()
-        for world in local_worlds:
-            if world not in sync_worlds:
-                self.worlds_listbox.insert(tk.END, f"{world} (local)")
+        sync_set = set(sync_worlds)
+        local_only = [world for world in self.host_manager.get_local_worlds()
+                      if world not in sync_set]
+        self._world_names = list(sync_worlds) + local_only
+        self._world_is_local = [False] * len(sync_worlds) + [True] * len(local_only)
+        items = list(sync_worlds)
+        items.extend(f"{world} (local)" for world in local_only)
+        
+        # Insertar todos los elementos en una sola llamada a Tk
+        if items:
+            self.worlds_listbox.insert(tk.END, *items)
         
         # Desactivar botones
         self.download_button.config(state=tk.DISABLED)
@@ -291,15 +334,8 @@ class MinecraftSyncApp:
         
         # Obtener el nombre del mundo seleccionado
         selected_index = self.worlds_listbox.curselection()[0]
-        selected_item = self.worlds_listbox.get(selected_index)
-        
-        # Si es local, quitar el sufijo
-        if " (local)" in selected_item:
-            world_name = selected_item.replace(" (local)", "")
-            is_local_only = True
-        else:
-            world_name = selected_item
-            is_local_only = False
+        world_name = self._world_names[selected_index]
+        is_local_only = self._world_is_local[selected_index]
         
         # Verificar estado del mundo
         if is_local_only:
@@ -312,74 +348,48 @@ class MinecraftSyncApp:
             self.download_button.config(state=tk.DISABLED)
             self.upload_button.config(state=tk.NORMAL)
         else:
-            # Obtener información detallada
-            status = self.host_manager.check_world_status(world_name)
-            
-            info_text = f"Mundo: {world_name}\n"
-            
+            # Mostrar solo el estado rápido (sin comparar archivos): los cambios
+            # locales y conflictos se verifican al descargar o subir
+            self.show_world_status(world_name, self.host_manager.peek_world_status(world_name))
+    
+    def show_world_status(self, world_name, status):
+        """Muestra el estado de un mundo sincronizado en el panel de información."""
+        info_text = f"Mundo: {world_name}\n"
+        
+        if status["exists_in_sync"]:
+            latest_info = status["latest_version_info"]
+            info_text += f"Última actualización: {latest_info.get('timestamp', 'Desconocido')}\n"
+            # Mostrar nombre de PC en vez de ID
+            pc_name = latest_info.get('pc_name', latest_info.get('pc_id', 'Desconocido'))
+            info_text += f"Actualizado por: {pc_name}\n"
+            info_text += f"Comentario: {latest_info.get('comment', 'Sin comentario')}\n\n"
+        
+        if status["exists_locally"]:
+            info_text += "Estado: Existe localmente\n"
+        else:
+            info_text += "Estado: No existe localmente\n"
+        
+        if status["has_latest_version"]:
+            info_text += "Versión: Tienes la última versión\n"
+            self.download_button.config(state=tk.DISABLED)
+        else:
             if status["exists_in_sync"]:
-                latest_info = status["latest_version_info"]
-                info_text += f"Última actualización: {latest_info.get('timestamp', 'Desconocido')}\n"
-                # Mostrar nombre de PC en vez de ID
-                pc_name = latest_info.get('pc_name', latest_info.get('pc_id', 'Desconocido'))
-                info_text += f"Actualizado por: {pc_name}\n"
-                info_text += f"Comentario: {latest_info.get('comment', 'Sin comentario')}\n\n"
-            
-            if status["exists_locally"]:
-                info_text += "Estado: Existe localmente\n"
+                info_text += "Versión: No tienes la última versión\n"
+                self.download_button.config(state=tk.NORMAL)
             else:
-                info_text += "Estado: No existe localmente\n"
-            
-            if status["has_latest_version"]:
-                info_text += "Versión: Tienes la última versión\n"
+                info_text += "Versión: No existe en el sistema de sincronización\n"
                 self.download_button.config(state=tk.DISABLED)
-            else:
-                if status["exists_in_sync"]:
-                    info_text += "Versión: No tienes la última versión\n"
-                    self.download_button.config(state=tk.NORMAL)
-                else:
-                    info_text += "Versión: No existe en el sistema de sincronización\n"
-                    self.download_button.config(state=tk.DISABLED)
+        
+        # Los cambios locales y los conflictos no se muestran aquí: solo los
+        # detecta la verificación completa, que se hace al descargar o subir
+        self.world_info_var.set(info_text)
+        
+        # Configurar botón de subida
+        if status["exists_locally"]:
+            self.upload_button.config(state=tk.NORMAL)
+        else:
+            self.upload_button.config(state=tk.DISABLED)
 
-            if status["has_local_changes"]:
-                if status["has_important_changes"]:
-                    info_text += "\n⚠️ Tienes cambios locales importantes que no han sido sincronizados\n"
-                else:
-                    info_text += "\nTienes cambios locales que no han sido sincronizados\n"
-                
-                # Opcional: mostrar detalle de cambios
-                if "local_changes_details" in status:
-                    details = status["local_changes_details"]
-                    
-                    # Mostrar resumen de cambios
-                    files_changed = len(details.get("modified_files", []))
-                    files_added = len(details.get("files_only_in_dir1", []))
-                    files_removed = len(details.get("files_only_in_dir2", []))
-                    
-                    if files_added > 0:
-                        info_text += f"  • {files_added} archivo(s) nuevo(s)\n"
-                    if files_changed > 0:
-                        info_text += f"  • {files_changed} archivo(s) modificado(s)\n"
-                    if files_removed > 0:
-                        info_text += f"  • {files_removed} archivo(s) eliminado(s)\n"
-                
-                # Siempre habilitar el botón de subida si hay cambios locales
-                self.upload_button.config(state=tk.NORMAL)
-            
-            # Mostrar conflictos si los hay
-            if status["conflicts"]:
-                info_text += "\nConflictos detectados:\n"
-                for conflict in status["conflicts"]:
-                    info_text += f"- {conflict['message']}\n"
-            
-            self.world_info_var.set(info_text)
-            
-            # Configurar botón de subida
-            if status["exists_locally"]:
-                self.upload_button.config(state=tk.NORMAL)
-            else:
-                self.upload_button.config(state=tk.DISABLED)
-    
     def download_selected_world(self):
         """Descarga el mundo seleccionado desde el sistema de sincronización."""
         if not self.worlds_listbox.curselection():
@@ -387,13 +397,10 @@ class MinecraftSyncApp:
         
         # Obtener el nombre del mundo seleccionado
         selected_index = self.worlds_listbox.curselection()[0]
-        selected_item = self.worlds_listbox.get(selected_index)
-        
-        # Si es local, quitar el sufijo
-        if " (local)" in selected_item:
+        if self._world_is_local[selected_index]:
             return  # No se puede descargar un mundo local
         
-        world_name = selected_item
+        world_name = self._world_names[selected_index]
         
         # Confirmar descarga
         if not messagebox.askyesno("Confirmar descarga", 
@@ -404,6 +411,28 @@ class MinecraftSyncApp:
         # Verificar estado y posibles conflictos
         status = self.host_manager.check_world_status(world_name)
         
+        if status["has_local_changes"]:
+            # La descarga reemplaza el mundo local: advertir de lo que no se subió
+            details = status.get("local_changes_details", {})
+            if status["has_important_changes"]:
+                changes_message = "⚠️ Tienes cambios locales importantes que no han sido sincronizados:\n\n"
+            else:
+                changes_message = "Tienes cambios locales que no han sido sincronizados:\n\n"
+            files_added = len(details.get("files_only_in_dir1", []))
+            files_changed = len(details.get("modified_files", []))
+            files_removed = len(details.get("files_only_in_dir2", []))
+            if files_added > 0:
+                changes_message += f"  • {files_added} archivo(s) nuevo(s)\n"
+            if files_changed > 0:
+                changes_message += f"  • {files_changed} archivo(s) modificado(s)\n"
+            if files_removed > 0:
+                changes_message += f"  • {files_removed} archivo(s) eliminado(s)\n"
+            
+            changes_message += "\nSe guardará una copia de seguridad del mundo local. ¿Deseas continuar con la descarga?"
+            
+            if not messagebox.askyesno("Cambios locales", changes_message):
+                return
+        
         if status["conflicts"]:
             # Hay conflictos, preguntar qué versión descargar
             conflict_message = "Se detectaron conflictos:\n\n"
@@ -434,15 +463,10 @@ class MinecraftSyncApp:
         
         # Obtener el nombre del mundo seleccionado
         selected_index = self.worlds_listbox.curselection()[0]
-        selected_item = self.worlds_listbox.get(selected_index)
-        
-        # Si es local, quitar el sufijo
-        if " (local)" in selected_item:
-            world_name = selected_item.replace(" (local)", "")
-        else:
-            world_name = selected_item
+        world_name = self._world_names[selected_index]
         
         # Pedir comentario para la subida
+        from tkinter import simpledialog
         comment = simpledialog.askstring("Comentario", 
                                         "Añade un comentario para esta actualización (opcional):",
                                         parent=self.root)
@@ -480,10 +504,18 @@ class MinecraftSyncApp:
                 messagebox.showerror("Error en la subida", message)
         except Exception as e:
             messagebox.showerror("Error", f"Ocurrió un error durante la subida: {str(e)}")
-            print(f"Ocurrió un error durante la subida: {str(e)}")
+            logger.exception("Ocurrió un error durante la subida")
 
 def main():
     """Función principal para iniciar la aplicación."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[
+            logging.FileHandler(Path(os.path.expanduser("~")) / ".minecraft_sync.log", "a", "utf-8"),
+            logging.StreamHandler()
+        ]
+    )
     root = tk.Tk()
     app = MinecraftSyncApp(root)
     root.mainloop()
@@ -1,52 +1,131 @@
 """
 Funciones de utilidad para la aplicación Minecraft World Sync.
 """
+import atexit
+import functools
 import json
+import logging
+import mmap
 import os
 import platform
-import uuid
 import shutil
 import hashlib
-import filecmp
+import errno
+import tarfile
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 
+logger = logging.getLogger("mcsync")
+
+# Archivos de esta PC, en la carpeta del usuario (no cambian durante la ejecución)
+_HOME = Path(os.path.expanduser("~"))
+_ID_FILE = _HOME / ".minecraft_sync_id"
+_NAME_FILE = _HOME / ".minecraft_sync_name"
+_CONFIG_FILE = _HOME / ".minecraft_sync_config"
+
+# orjson es opcional: si está instalado se usa para leer y escribir JSON
+# (3-5 veces más rápido que el módulo json estándar)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# xxhash también es opcional: xxh3 calcula el hash de los archivos de región
+# varias veces más rápido que hashlib; si no está se usa blake2b
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Archivos que Minecraft actualiza constantemente pero no son relevantes para
+# la sincronización (patrones; '*' solo se admite al inicio). session.lock
+# además está bloqueado mientras Minecraft tiene el mundo abierto.
+IGNORE_PATTERNS = [
+    'session.lock',
+    '.DS_Store',
+    'Thumbs.db',
+    '*.tmp',
+    '*.log.lck'
+]
+
+# Los nombres exactos se buscan en un conjunto y las terminaciones se comprueban
+# con una sola llamada a str.endswith
+_IGNORE_NAMES = frozenset(p for p in IGNORE_PATTERNS if not p.startswith('*'))
+_IGNORE_SUFFIXES = tuple(p[1:] for p in IGNORE_PATTERNS if p.startswith('*'))
+
+# Búfer de copia de 4 MiB para shutil (por defecto 64 KiB en Linux/macOS y
+# 1 MiB en Windows). La carpeta de OneDrive suele estar en una unidad de red,
+# donde cada lectura o escritura puede esperar a la red; el costo es 4 MiB de
+# memoria por cada copia en curso.
+shutil.COPY_BUFSIZE = 4 * 1024 * 1024
+
+# En Windows, CopyFileW copia sin pasar los datos por Python
+if os.name == "nt":
+    import ctypes
+    import ctypes.wintypes
+    _CopyFileW = ctypes.WinDLL("kernel32", use_last_error=True).CopyFileW
+    _CopyFileW.argtypes = (ctypes.wintypes.LPCWSTR, ctypes.wintypes.LPCWSTR, ctypes.wintypes.BOOL)
+    _CopyFileW.restype = ctypes.wintypes.BOOL
+else:
+    _CopyFileW = None
+
+# Cabecera PAX propia donde se guarda la fecha de modificación exacta (en ns)
+# de cada archivo empaquetado, para que el manifiesto coincida tras extraerlo
+_PAX_MTIME_NS = "MINECRAFTSYNC.mtime_ns"
+
+# Contenido de los JSON leídos: {ruta: (mtime_ns, tamaño, bytes)}
+_json_cache = {}
+
+# Hashes de archivos ya calculados: {ruta: [tamaño, mtime_ns, hash]}. Se carga
+# del disco la primera vez que se usa y se guarda al cerrar la aplicación.
+_HASH_CACHE_FILE = _HOME / ".minecraft_sync_hashcache.json"
+_HASH_ALGORITHM = "xxh3_64" if xxhash else "blake2b"
+_hash_cache = None
+_hash_cache_dirty = False
+_hash_cache_lock = threading.Lock()  # compare_directories compara en varios hilos
+
+# Hasta este tamaño es más rápido comparar dos archivos directamente que
+# calcular y guardar sus hashes
+_DIRECT_COMPARE_MAX_SIZE = 10 * 1024 * 1024
+
+def _should_ignore(name):
+    """Indica si un archivo debe ignorarse al comparar, copiar o empaquetar mundos."""
+    return name in _IGNORE_NAMES or name.endswith(_IGNORE_SUFFIXES)
+
+@functools.lru_cache(maxsize=1)
 def get_computer_id():
     """
     Genera un identificador único para la computadora.
-    Si no existe, crea uno nuevo y lo guarda.
-    Ahora genera un identificador corto (máximo 5 caracteres) para evitar
-    problemas con rutas demasiado largas.
+    Se deriva de la información del equipo, así que siempre es el mismo para la
+    misma computadora (aunque se borre la carpeta de usuario) y no hace falta
+    guardarlo. Es corto (5 caracteres) para evitar problemas con rutas
+    demasiado largas.
     """
-    id_file = Path(os.path.expanduser("~")) / ".minecraft_sync_id"
-    
-    if id_file.exists():
-        with open(id_file, 'r') as f:
+    # Las versiones anteriores guardaban el ID en un archivo: si existe se sigue
+    # usando, para no perder la carpeta de sincronización de esta PC
+    try:
+        with open(_ID_FILE, 'r') as f:
             return f.read().strip()
-    else:
-        # Generar un hash corto basado en información de hardware
-        system_info = platform.node() + platform.processor()
-        
-        # Usar hashlib para generar un identificador corto pero único
-        hash_obj = hashlib.md5(system_info.encode())
-        new_id = hash_obj.hexdigest()[:5]  # Solo usar los primeros 5 caracteres del hash
-        
-        # Guardar el ID para uso futuro
-        with open(id_file, 'w') as f:
-            f.write(new_id)
-        
-        return new_id
+    except FileNotFoundError:
+        pass
+    
+    # Generar un hash corto basado en información de hardware (blake2b está
+    # disponible aunque md5 esté deshabilitado por FIPS)
+    system_info = platform.node() + platform.processor() + platform.machine()
+    hash_obj = hashlib.blake2b(system_info.encode(), digest_size=3)
+    return hash_obj.hexdigest()[:5]  # Solo usar los primeros 5 caracteres del hash
 
+@functools.lru_cache(maxsize=1)
 def get_computer_name():
     """
     Recupera el nombre amigable de la computadora.
     Si no existe, retorna None (para que la aplicación solicite uno).
     """
-    name_file = Path(os.path.expanduser("~")) / ".minecraft_sync_name"
-    
-    if name_file.exists():
-        with open(name_file, 'r', encoding='utf-8') as f:
+    if _NAME_FILE.exists():
+        with open(_NAME_FILE, 'r', encoding='utf-8') as f:
             return f.read().strip()
     return None
 
@@ -54,10 +133,12 @@ def save_computer_name(name):
     """
     Guarda el nombre amigable de la computadora.
     """
-    name_file = Path(os.path.expanduser("~")) / ".minecraft_sync_name"
-    
-    with open(name_file, 'w', encoding='utf-8') as f:
-        f.write(name)
+    write_bytes_atomic(_NAME_FILE, name.encode('utf-8'))
+    get_computer_name.cache_clear()
+
+def get_config_path():
+    """Ruta del archivo de configuración local (p. ej. la carpeta de OneDrive detectada)."""
+    return _CONFIG_FILE
 
 def get_computer_display_name():
     """
@@ -73,6 +154,40 @@ def ensure_dir_exists(directory):
     """Asegura que el directorio exista, creándolo si es necesario."""
     Path(directory).mkdir(parents=True, exist_ok=True)
 
+# Funciones para convertir JSON, elegidas una sola vez según si orjson está
+# instalado. Ambas trabajan con bytes en UTF-8.
+if orjson is not None:
+    _loads_json = orjson.loads
+    
+    def _dumps_json(data):
+        """Serializa datos a JSON (UTF-8, indentación de 2 espacios) como bytes."""
+        # OPT_NON_STR_KEYS acepta claves no str, como hace json.dumps
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+else:
+    _loads_json = json.loads  # acepta bytes y detecta la codificación
+    
+    def _dumps_json(data):
+        """Serializa datos a JSON (UTF-8, indentación de 2 espacios) como bytes."""
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def _read_json_bytes(file_path):
+    """
+    Lee el contenido de un archivo JSON, reutilizando el de la última lectura si
+    el archivo no cambió (mismo tamaño y fecha de modificación). Se guarda el
+    contenido y no los datos ya convertidos, porque quien llama puede
+    modificarlos y volver a convertirlos es más barato que copiarlos.
+    """
+    key = os.path.abspath(file_path)
+    st = os.stat(key)
+    cached = _json_cache.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    
+    with open(key, 'rb') as f:
+        content = f.read()
+    _json_cache[key] = (st.st_mtime_ns, st.st_size, content)
+    return content
+
 def load_json(file_path, default=None):
     """
     Carga un archivo JSON. Si no existe o hay error, devuelve el valor predeterminado.
@@ -81,68 +196,397 @@ def load_json(file_path, default=None):
         default = {}
     
     try:
-        if not Path(file_path).exists():
-            return default
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _loads_json(_read_json_bytes(file_path))
+    except FileNotFoundError:
+        return default
     except Exception as e:
-        print(f"Error al cargar {file_path}: {e}")
+        logger.warning("Error al cargar %s: %s", file_path, e)
         return default
 
 def save_json(file_path, data):
-    """Guarda datos en un archivo JSON."""
-    ensure_dir_exists(Path(file_path).parent)
+    """
+    Guarda datos en un archivo JSON.
+    Se escribe de forma atómica: si la escritura se interrumpe (por ejemplo,
+    mientras OneDrive sincroniza) el archivo anterior queda intacto en vez de
+    un JSON a medias.
+    """
+    write_bytes_atomic(file_path, _dumps_json(data))
+
+def save_json_atomic(file_path, data):
+    """
+    Guarda datos en un archivo JSON de forma atómica.
+    Si el contenido no cambió no se reescribe el archivo (evita que OneDrive
+    vuelva a sincronizarlo); si cambió, se escribe en un archivo temporal y
+    se reemplaza el original, de modo que nunca quede un JSON a medio escribir.
+    """
+    file_path = Path(file_path)
+    content = _dumps_json(data)
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        if file_path.read_bytes() == content:
+            return
+    except OSError:
+        pass
+    
+    write_bytes_atomic(file_path, content)
+
+def write_bytes_atomic(file_path, content):
+    """
+    Escribe el contenido en un archivo temporal y luego reemplaza el original,
+    de modo que el archivo nunca quede escrito a medias.
+    """
+    file_path = Path(file_path)
+    _json_cache.pop(os.path.abspath(file_path), None)
+    ensure_dir_exists(file_path.parent)
+    tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def _copy_one(s, d):
+    """Copia un archivo y retorna (s, d, error) si falla, o None."""
+    try:
+        _clone_file(s, d)
+    except Exception as e:
+        logger.warning("No se pudo copiar %s a %s: %s", s, d, e)
+        return (s, d, str(e))
+    return None
 
 def copy_directory(src, dst):
     """
     Copia el contenido de un directorio a otro.
     Maneja mejor los errores para proveer más información.
+    Los archivos se copian en paralelo: en mundos con miles de archivos pequeños
+    lo que más tarda es abrir y cerrar cada archivo, no transferir los datos.
+    """
+    # Listar todos los archivos y crear las carpetas destino antes de copiar,
+    # para que los hilos no compitan creando los mismos directorios
+    files = []
+    
+    def scan(subdir, target_dir):
+        os.makedirs(target_dir, exist_ok=True)
+        # DirEntry ya sabe si es carpeta (lo trae la lectura del directorio),
+        # así que no hace falta un stat por elemento
+        with os.scandir(subdir) as it:
+            for entry in it:
+                d = os.path.join(target_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    scan(entry.path, d)
+                elif not _should_ignore(entry.name):
+                    files.append((entry.path, d))
+    
+    scan(src, dst)
+    
+    with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2)) as executor:
+        errors = [e for e in executor.map(lambda pair: _copy_one(*pair), files) if e]
+    
+    if errors:
+        logger.error("Error copiando directorio: %d errores", len(errors))
+        raise Exception(errors)
+
+def _clone_file(src, dst):
+    """
+    Copia un archivo preservando sus metadatos.
+    En Linux intenta os.copy_file_range, que en btrfs/XFS comparte los bloques
+    (reflink) en vez de duplicarlos; en Windows usa CopyFileW, que copia dentro
+    del sistema y conserva las fechas. En otros casos usa shutil.copy2 (que en
+    Linux ya copia con sendfile).
+    """
+    if _CopyFileW is not None:
+        if _CopyFileW(str(src), str(dst), False):
+            return
+        raise ctypes.WinError(ctypes.get_last_error())
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            # Si la copia se cortó antes de tiempo (algunos sistemas de archivos
+            # de red o FUSE lo hacen), se repite entera con shutil.copy2
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    shutil.copy2(src, dst)
+
+def fast_hash(path, bufsize=1 << 20):
+    """
+    Calcula el hash del contenido de un archivo.
+    Solo sirve para comparar archivos en esta misma PC: el resultado depende de
+    si xxhash está instalado.
+    """
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if xxhash is None and hasattr(hashlib, "file_digest"):
+            # Python 3.11+: lee el archivo en un bucle de C, sin el GIL mientras
+            # calcula el hash, así varios hilos pueden calcular hashes a la vez
+            return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+        h = xxhash.xxh3_64() if xxhash else hashlib.blake2b(digest_size=16)
+        while chunk := f.read(bufsize):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _save_hash_cache():
+    """Guarda en disco los hashes calculados durante esta ejecución."""
+    if _hash_cache_dirty:
+        # Descartar los hashes de archivos que ya no existen (por ejemplo, de
+        # las carpetas minecraft_saves_data antiguas, que se borran al sincronizar)
+        entries = {path: value for path, value in _hash_cache.items()
+                   if os.path.exists(path)}
+        save_json(_HASH_CACHE_FILE, {"algorithm": _HASH_ALGORITHM, "entries": entries})
+
+def _file_digest(path, st):
+    """
+    Retorna el hash del contenido de un archivo, reutilizando el ya calculado
+    si el tamaño y la fecha de modificación (st) no cambiaron.
+    """
+    global _hash_cache, _hash_cache_dirty
+    with _hash_cache_lock:
+        if _hash_cache is None:
+            data = load_json(_HASH_CACHE_FILE, {})
+            # Un hash calculado con otro algoritmo no sirve para comparar
+            _hash_cache = data.get("entries", {}) if data.get("algorithm") == _HASH_ALGORITHM else {}
+            atexit.register(_save_hash_cache)
+    
+    key = os.path.abspath(path)
+    cached = _hash_cache.get(key)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    
+    digest = fast_hash(path)
+    _hash_cache[key] = [st.st_size, st.st_mtime_ns, digest]
+    _hash_cache_dirty = True
+    return digest
+
+def _fast_cmp(path1, path2, chunk_size=1 << 20):
+    """
+    Compara el contenido de dos archivos proyectándolos en memoria (mmap).
+    Compara por bloques (memcmp) y se detiene en el primer bloque distinto.
+    """
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        size = os.fstat(f1.fileno()).st_size
+        if size != os.fstat(f2.fileno()).st_size:
+            return False
+        if size == 0:
+            return True  # mmap no admite archivos vacíos
+        with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ) as m1, \
+                mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ) as m2:
+            for offset in range(0, size, chunk_size):
+                if m1[offset:offset + chunk_size] != m2[offset:offset + chunk_size]:
+                    return False
+    return True
+
+def build_manifest(root):
+    """
+    Construye el manifiesto de un directorio: {ruta_relativa: [tamaño, mtime_ns]}.
+    Las rutas usan '/' como separador en todos los sistemas operativos, para
+    poder comparar manifiestos de distintas PC. Los subdirectorios se registran
+    con valor None para poder replicarlos aunque estén vacíos.
+    """
+    manifest = {}
+    
+    def scan(subdir, rel_path):
+        with os.scandir(subdir) as it:
+            for entry in it:
+                rel_item_path = f"{rel_path}/{entry.name}" if rel_path else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    manifest[rel_item_path] = None
+                    scan(entry.path, rel_item_path)
+                elif not _should_ignore(entry.name):
+                    st = entry.stat(follow_symlinks=False)
+                    manifest[rel_item_path] = [st.st_size, st.st_mtime_ns]
+    
+    if Path(root).is_dir():
+        scan(root, "")
+    return manifest
+
+def hash_manifest(manifest):
+    """
+    Calcula un identificador de 12 caracteres a partir de un manifiesto.
+    Dos mundos con los mismos archivos (ruta, tamaño y fecha de modificación)
+    producen el mismo identificador, en cualquier sistema operativo.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for rel_path in sorted(manifest):
+        info = manifest[rel_path]
+        h.update(rel_path.encode('utf-8'))
+        if info is None:
+            h.update(b"\0dir\0")
+        else:
+            h.update(f"\0{info[0]}\0{info[1]}\0".encode())
+    return h.hexdigest()[:12]
+
+def pack_world(src, archive_path):
+    """
+    Empaqueta el directorio src en un único archivo .tar.gz.
+    OneDrive sincroniza mucho mejor un archivo grande que miles de archivos
+    pequeños. Se escribe en un archivo temporal y luego se reemplaza el
+    original, para que OneDrive nunca suba un archivo a medio escribir.
+    """
+    archive_path = Path(archive_path)
+    ensure_dir_exists(archive_path.parent)
+    tmp_path = archive_path.with_suffix(archive_path.suffix + ".tmp")
+    
+    # Los archivos de región ya vienen comprimidos: un nivel bajo es
+    # mucho más rápido y comprime casi lo mismo
+    with tarfile.open(tmp_path, "w:gz", compresslevel=1, format=tarfile.PAX_FORMAT) as tar:
+        def add_dir(subdir, rel_path):
+            with os.scandir(subdir) as it:
+                for entry in it:
+                    if not entry.is_dir(follow_symlinks=False) and _should_ignore(entry.name):
+                        continue
+                    arcname = f"{rel_path}/{entry.name}" if rel_path else entry.name
+                    info = tar.gettarinfo(entry.path, arcname)
+                    if info.isdir():
+                        tar.addfile(info)
+                        add_dir(entry.path, arcname)
+                    elif info.isfile():
+                        st = entry.stat(follow_symlinks=False)
+                        info.pax_headers[_PAX_MTIME_NS] = str(st.st_mtime_ns)
+                        with open(entry.path, 'rb') as f:
+                            tar.addfile(info, f)
+                    else:
+                        tar.addfile(info)
+        
+        add_dir(src, "")
+    
+    os.replace(tmp_path, archive_path)
+
+def unpack_world(archive_path, dst):
+    """
+    Extrae en dst un archivo creado con pack_world, restaurando la fecha de
+    modificación exacta de cada archivo.
     """
-    # Asegurar que el directorio destino exista
     ensure_dir_exists(dst)
     
-    errors = []
+    with tarfile.open(archive_path, "r:gz") as tar:
+        for member in tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extract(member, dst, filter="data")
+            else:
+                # Python sin filtros de extracción: validar la ruta a mano
+                parts = Path(member.name).parts
+                if (os.path.isabs(member.name) or ".." in parts or
+                        member.issym() or member.islnk()):
+                    raise ValueError(f"Entrada no permitida en {archive_path}: {member.name}")
+                tar.extract(member, dst)
+            
+            mtime_ns = member.pax_headers.get(_PAX_MTIME_NS)
+            if mtime_ns is not None and member.isfile():
+                mtime_ns = int(mtime_ns)
+                os.utime(os.path.join(dst, member.name), ns=(mtime_ns, mtime_ns))
+
+def compare_manifests(manifest1, manifest2):
+    """
+    Compara dos manifiestos (ver build_manifest) y retorna un diccionario con
+    el mismo formato que compare_directories. Permite detectar cambios sin
+    tener una copia completa del mundo con la cual comparar.
+    """
+    result = {
+        "identical": True,
+        "differences": {
+            "files_only_in_dir1": [],
+            "files_only_in_dir2": [],
+            "modified_files": [],
+            "dirs_only_in_dir1": [],
+            "dirs_only_in_dir2": []
+        },
+        "has_important_changes": False
+    }
+    differences = result["differences"]
+    current_time = time.time_ns()
+    one_day_ns = 86400 * 10**9
     
-    # Copiar archivos y subdirectorios
-    for item in os.listdir(src):
-        s = os.path.join(src, item)
-        d = os.path.join(dst, item)
+    for rel_path, info in manifest1.items():
+        if info is not None and _should_ignore(rel_path.rsplit("/", 1)[-1]):
+            continue
         
-        try:
-            if os.path.isdir(s):
-                ensure_dir_exists(d)  # Asegurar que el directorio destino existe primero
-                shutil.copytree(s, d, dirs_exist_ok=True)
+        if rel_path not in manifest2:
+            key = "dirs_only_in_dir1" if info is None else "files_only_in_dir1"
+            important = True
+        else:
+            other = manifest2[rel_path]
+            if info == other:
+                continue
+            key = "modified_files"
+            if info is None or other is None:
+                important = True
             else:
-                # Asegurar que el directorio padre del archivo destino exista
-                ensure_dir_exists(os.path.dirname(d))
-                shutil.copy2(s, d)
-        except Exception as e:
-            print(f"No se pudo copiar {s} a {d}: {e}")
-            errors.append((s, d, str(e)))
+                # Igual que en compare_directories: los cambios recientes (últimas
+                # 24 horas) o con diferencia de tamaño significativa son importantes
+                important = (current_time - info[1] < one_day_ns or
+                             current_time - other[1] < one_day_ns or
+                             abs(info[0] - other[0]) > 100)
+        
+        differences[key].append(rel_path)
+        result["identical"] = False
+        if important:
+            result["has_important_changes"] = True
     
-    if errors:
-        print(f"Error copiando directorio: {len(errors)} errores")
-        raise Exception(errors)
+    for rel_path, info in manifest2.items():
+        if rel_path in manifest1:
+            continue
+        if info is not None and _should_ignore(rel_path.rsplit("/", 1)[-1]):
+            continue
+        differences["dirs_only_in_dir2" if info is None else "files_only_in_dir2"].append(rel_path)
+        result["identical"] = False
+        result["has_important_changes"] = True
+    
+    return result
 
 def get_timestamp():
     """Obtiene una marca de tiempo en formato legible."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def get_timestamp_ns():
+    """
+    Obtiene una marca de tiempo entera en nanosegundos.
+    Se guarda junto a la marca legible para comparar versiones sin parsear texto.
+    """
+    return time.time_ns()
+
+def same_timestamp(info1, info2):
+    """
+    Indica si dos registros (control.json o entradas de mundos.json) tienen la
+    misma marca de tiempo. Usa timestamp_ns cuando ambos lo tienen; los
+    registros antiguos solo tienen la marca legible.
+    """
+    ns1 = info1.get("timestamp_ns")
+    ns2 = info2.get("timestamp_ns")
+    if ns1 is not None and ns2 is not None:
+        return ns1 == ns2
+    return info1.get("timestamp") == info2.get("timestamp")
+
+@functools.lru_cache(maxsize=256)
+def _timestamp_to_ns(timestamp):
+    """Convierte una marca legible (o una en ns) a nanosegundos desde la época."""
+    if isinstance(timestamp, int):
+        return timestamp
+    dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    return int(dt.timestamp()) * 1_000_000_000
+
 def compare_timestamps(timestamp1, timestamp2):
-    """Compara dos marcas de tiempo y devuelve la más reciente."""
-    dt1 = datetime.strptime(timestamp1, "%Y-%m-%d %H:%M:%S")
-    dt2 = datetime.strptime(timestamp2, "%Y-%m-%d %H:%M:%S")
-    
-    if dt1 > dt2:
-        return 1
-    elif dt1 < dt2:
-        return -1
-    else:
-        return 0
+    """
+    Compara dos marcas de tiempo y devuelve la más reciente.
+    Acepta marcas en ns (get_timestamp_ns) o legibles (get_timestamp). Dos
+    marcas del mismo tipo se comparan directamente: el formato legible tiene
+    ancho fijo y ceros a la izquierda, así que el orden del texto es el mismo
+    que el de las fechas. Solo al mezclar tipos se convierte la legible.
+    """
+    if type(timestamp1) is type(timestamp2):
+        return (timestamp1 > timestamp2) - (timestamp1 < timestamp2)
+    ns1 = _timestamp_to_ns(timestamp1)
+    ns2 = _timestamp_to_ns(timestamp2)
+    return (ns1 > ns2) - (ns1 < ns2)
 
 def compare_directories(dir1, dir2):
     """
@@ -170,14 +614,6 @@ def compare_directories(dir1, dir2):
         "has_important_changes": False
     }
     
-    # Archivos y carpetas a ignorar (patrones)
-    ignore_patterns = [
-        'session.lock',
-        '.DS_Store',
-        'Thumbs.db',
-        '*.tmp'
-    ]
-    
     # Convertir a objetos Path
     dir1_path = Path(dir1)
     dir2_path = Path(dir2)
@@ -188,91 +624,110 @@ def compare_directories(dir1, dir2):
         result["has_important_changes"] = True
         return result
     
-    # Función para determinar si un archivo debe ser ignorado
-    def should_ignore(path):
-        name = os.path.basename(path)
-        return any(name == pattern or (pattern.startswith('*') and name.endswith(pattern[1:])) for pattern in ignore_patterns)
-    
-    # Función para comparar un directorio y sus subdirectorios
+    # Función para comparar un directorio (sin recorrer sus subdirectorios).
+    # os.scandir trae el tipo de cada elemento en la misma lectura del
+    # directorio, y su stat queda guardado en el DirEntry.
+    # Retorna (diferencias, hay_cambios_importantes, subdirectorios_comunes).
     def compare_dirs(subdir1, subdir2, rel_path=""):
-        nonlocal result
+        differences = {key: [] for key in result["differences"]}
+        important = False
+        common_dirs = []
         
-        # Obtener listas de archivos y carpetas en ambos directorios
-        dir1_items = os.listdir(subdir1)
-        dir2_items = os.listdir(subdir2)
-        
-        # Crear conjuntos para facilitar comparaciones
-        dir1_set = set(dir1_items)
-        dir2_set = set(dir2_items)
+        # Obtener los elementos de ambos directorios
+        with os.scandir(subdir1) as it:
+            entries1 = {entry.name: entry for entry in it}
+        with os.scandir(subdir2) as it:
+            entries2 = {entry.name: entry for entry in it}
         
         # Elementos únicos en cada directorio
-        only_in_dir1 = dir1_set - dir2_set
-        only_in_dir2 = dir2_set - dir1_set
+        only_in_dir1 = entries1.keys() - entries2.keys()
+        only_in_dir2 = entries2.keys() - entries1.keys()
         
         # Comprobar elementos únicos en dir1
         for item in only_in_dir1:
-            item_path = os.path.join(subdir1, item)
             rel_item_path = os.path.join(rel_path, item)
             
-            if os.path.isdir(item_path):
-                result["differences"]["dirs_only_in_dir1"].append(rel_item_path)
-                result["identical"] = False
+            if entries1[item].is_dir(follow_symlinks=False):
+                differences["dirs_only_in_dir1"].append(rel_item_path)
                 # Considerar carpetas adicionales como cambios importantes
-                result["has_important_changes"] = True
-            elif not should_ignore(item):
-                result["differences"]["files_only_in_dir1"].append(rel_item_path)
-                result["identical"] = False
+                important = True
+            elif not _should_ignore(item):
+                differences["files_only_in_dir1"].append(rel_item_path)
                 # Archivos adicionales siempre son cambios importantes
-                result["has_important_changes"] = True
+                important = True
         
         # Comprobar elementos únicos en dir2
         for item in only_in_dir2:
-            item_path = os.path.join(subdir2, item)
             rel_item_path = os.path.join(rel_path, item)
             
-            if os.path.isdir(item_path):
-                result["differences"]["dirs_only_in_dir2"].append(rel_item_path)
-                result["identical"] = False
+            if entries2[item].is_dir(follow_symlinks=False):
+                differences["dirs_only_in_dir2"].append(rel_item_path)
                 # Considerar carpetas adicionales como cambios importantes
-                result["has_important_changes"] = True
-            elif not should_ignore(item):
-                result["differences"]["files_only_in_dir2"].append(rel_item_path)
-                result["identical"] = False
+                important = True
+            elif not _should_ignore(item):
+                differences["files_only_in_dir2"].append(rel_item_path)
                 # Archivos adicionales siempre son cambios importantes
-                result["has_important_changes"] = True
+                important = True
         
         # Comprobar elementos comunes
-        common_items = dir1_set.intersection(dir2_set)
+        common_items = entries1.keys() & entries2.keys()
         for item in common_items:
-            item1_path = os.path.join(subdir1, item)
-            item2_path = os.path.join(subdir2, item)
+            entry1 = entries1[item]
+            entry2 = entries2[item]
             rel_item_path = os.path.join(rel_path, item)
             
-            if os.path.isdir(item1_path) and os.path.isdir(item2_path):
-                # Recursivamente comparar subdirectorios
-                compare_dirs(item1_path, item2_path, rel_item_path)
-            elif os.path.isfile(item1_path) and os.path.isfile(item2_path):
+            if entry1.is_dir(follow_symlinks=False) and entry2.is_dir(follow_symlinks=False):
+                # Los subdirectorios se comparan en otra tarea
+                common_dirs.append((entry1.path, entry2.path, rel_item_path))
+            elif entry1.is_file(follow_symlinks=False) and entry2.is_file(follow_symlinks=False):
                 # Ignorar archivos en la lista de ignorados
-                if should_ignore(item):
+                if _should_ignore(item):
                     continue
                 
-                # Comparar archivos
-                if not filecmp.cmp(item1_path, item2_path, shallow=False):
-                    result["differences"]["modified_files"].append(rel_item_path)
-                    result["identical"] = False
-                    
-                    # Comprobar modificación reciente (últimas 24 horas)
-                    mod_time1 = os.path.getmtime(item1_path)
-                    mod_time2 = os.path.getmtime(item2_path)
-                    current_time = time.time()
-                    
-                    # Si alguno de los archivos fue modificado recientemente o
-                    # sus tamaños son significativamente diferentes, considerar como cambio importante
-                    if (current_time - mod_time1 < 86400 or current_time - mod_time2 < 86400 or
-                        abs(os.path.getsize(item1_path) - os.path.getsize(item2_path)) > 100):
-                        result["has_important_changes"] = True
+                # Comparar archivos: con el mismo tamaño y fecha se consideran
+                # iguales sin leerlos; si solo cambió la fecha se compara el
+                # contenido (directamente si son pequeños, o con hashes que se
+                # guardan para la próxima vez si son grandes)
+                st1 = entry1.stat(follow_symlinks=False)
+                st2 = entry2.stat(follow_symlinks=False)
+                if st1.st_size == st2.st_size:
+                    if st1.st_mtime_ns == st2.st_mtime_ns:
+                        continue
+                    if st1.st_size <= _DIRECT_COMPARE_MAX_SIZE:
+                        if _fast_cmp(entry1.path, entry2.path):
+                            continue
+                    elif _file_digest(entry1.path, st1) == _file_digest(entry2.path, st2):
+                        continue
+                
+                differences["modified_files"].append(rel_item_path)
+                
+                # Comprobar modificación reciente (últimas 24 horas)
+                mod_time1 = st1.st_mtime
+                mod_time2 = st2.st_mtime
+                current_time = time.time()
+                
+                # Si alguno de los archivos fue modificado recientemente o
+                # sus tamaños son significativamente diferentes, considerar como cambio importante
+                if (current_time - mod_time1 < 86400 or current_time - mod_time2 < 86400 or
+                    abs(st1.st_size - st2.st_size) > 100):
+                    important = True
+        
+        return differences, important, common_dirs
     
-    # Iniciar la comparación recursiva
-    compare_dirs(dir1_path, dir2_path)
+    # Comparar los directorios en paralelo: cada subdirectorio común es una
+    # tarea nueva, así las lecturas de directorios y los hashes se solapan
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        pending = {executor.submit(compare_dirs, dir1_path, dir2_path)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                differences, important, common_dirs = future.result()
+                for key, items in differences.items():
+                    if items:
+                        result["differences"][key].extend(items)
+                        result["identical"] = False
+                if important:
+                    result["has_important_changes"] = True
+                pending.update(executor.submit(compare_dirs, *args) for args in common_dirs)
     
     return result
\ No newline at end of file